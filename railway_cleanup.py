@@ -18,9 +18,22 @@ railway_cleanup.py — BugKSA Bot Railway Account Cleanup
 import sys
 import json
 import time
+import random
 import argparse
-import urllib.request
-import urllib.error
+import threading
+import http.client
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from functools import lru_cache
+from operator import itemgetter
+from urllib.parse import urlsplit
+
+try:
+    import orjson   # already a bot dependency; faster and emits bytes directly
+    _dumps, _loads = orjson.dumps, orjson.loads
+except ImportError:   # the script still runs on a bare stdlib
+    def _dumps(obj) -> bytes:
+        return json.dumps(obj).encode()
+    _loads = json.loads
 
 API_URL = "https://backboard.railway.app/graphql/v2"
 GITHUB_REPO    = "mohammed8500/bugksa-bot"
@@ -29,34 +42,102 @@ PROJECT_ID     = "97c65c33-2746-4be6-b541-2422dae46653"   # معرّف مشرو
 SERVICE_NAME   = "worker"
 VOLUME_NAME    = "bot_data"
 MOUNT_PATH     = "/app/data"
-REQUIRED_VARS = [
-    "OPENAI_API_KEY",
+MAX_RETRIES    = 5
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+MAX_WORKERS    = 4      # الافتراضي لـ --workers — لطيف مع rate limiter الخاص بـ Railway
+REQUIRED_VARS = (
+    "GEMINI_API_KEY",
     "X_API_KEY",
     "X_API_SECRET",
     "X_ACCESS_TOKEN",
     "X_ACCESS_SECRET",
-]
+)
 
 # ── Helpers ────────────────────────────────────────────────────────────────────
 
-def gql(token: str, query: str, variables: dict = None):
-    payload = json.dumps({"query": query, "variables": variables or {}}).encode()
-    req = urllib.request.Request(
-        API_URL,
-        data=payload,
-        headers={
-            "Content-Type": "application/json",
-            "Authorization": f"Bearer {token}",
-        },
-        method="POST",
-    )
-    try:
-        with urllib.request.urlopen(req, timeout=30) as resp:
-            data = json.loads(resp.read())
-    except urllib.error.HTTPError as e:
-        body = e.read().decode()
-        print(f"[HTTP {e.code}] {body}")
+_API = urlsplit(API_URL)
+_PROJECT_NAME_LC = PROJECT_NAME.lower()
+_SERVICE_NAME_LC = SERVICE_NAME.lower()
+_local = threading.local()   # one keep-alive HTTPS connection per thread (http.client isn't thread-safe)
+_conns = []                  # every connection opened, so main() can close them all
+
+
+def _post(payload: bytes, headers: dict, idempotent: bool = True) -> tuple:
+    """POST to the GraphQL endpoint over this thread's connection → (status, retry_after, body).
+
+    A reused keep-alive socket the server already closed is replayed once on a fresh
+    connection. Non-idempotent calls are never replayed (the POST may have landed), so
+    they start on a fresh connection instead of risking a stale one.
+    """
+    if not idempotent and getattr(_local, "conn", None) is not None:
+        _local.conn.close()
+        _local.conn = None
+    for attempt in range(2):
+        conn = getattr(_local, "conn", None)
+        reused = conn is not None
+        if not reused:
+            conn = _local.conn = http.client.HTTPSConnection(_API.hostname, _API.port, timeout=30)
+            _conns.append(conn)
+        try:
+            conn.request("POST", _API.path, body=payload, headers=headers)
+            resp = conn.getresponse()
+            return resp.status, resp.getheader("Retry-After"), resp.read()
+        except (OSError, http.client.HTTPException) as e:
+            conn.close()
+            _local.conn = None
+            # Server closed the idle keep-alive socket – reconnect once, never twice
+            stale = isinstance(e, (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError))
+            if not (stale and reused and idempotent) or attempt:
+                raise
+
+
+def _backoff(attempt: int, retry_after: str = None) -> float:
+    """Seconds to wait before retry #attempt – honours Retry-After, else jittered linear growth."""
+    if retry_after and retry_after.isdigit():
+        return min(int(retry_after), 60)
+    return min(30.0, random.uniform(2, 4) * (attempt + 1))
+
+
+@lru_cache(maxsize=None)
+def _compact(query: str) -> str:
+    """Collapse a query's indentation/newlines once – it goes over the wire on every call."""
+    return " ".join(query.split())
+
+
+@lru_cache(maxsize=None)
+def _headers(token: str) -> dict:
+    """Request headers, built once per token and shared by every call (never mutated)."""
+    return {
+        "Content-Type": "application/json",
+        "Authorization": f"Bearer {token}",
+    }
+
+
+def gql(token: str, query: str, variables: dict = None, idempotent: bool = True):
+    """Run one GraphQL operation. 429/5xx/network errors are retried with backoff;
+    non-idempotent calls (creates) are only retried on 429, which Railway never processed."""
+    payload = _dumps({"query": _compact(query), "variables": variables or {}})
+    headers = _headers(token)
+    for attempt in range(MAX_RETRIES + 1):
+        try:
+            status, retry_after, body = _post(payload, headers, idempotent)
+        except (OSError, http.client.HTTPException) as e:
+            if not idempotent or attempt == MAX_RETRIES:
+                raise
+            delay = _backoff(attempt)
+            print(f"  ⏳ [Network Error] {e} — إعادة المحاولة بعد {delay:.0f}ث")
+            time.sleep(delay)
+            continue
+        retryable = status == 429 or (idempotent and status in RETRY_STATUSES)
+        if not retryable or attempt == MAX_RETRIES:
+            break
+        delay = _backoff(attempt, retry_after)
+        print(f"  ⏳ [HTTP {status}] إعادة المحاولة بعد {delay:.0f}ث")
+        time.sleep(delay)
+    if status >= 400:
+        print(f"[HTTP {status}] {body.decode()}")
         sys.exit(1)
+    data = _loads(body)
     if "errors" in data:
         for err in data["errors"]:
             print(f"[GraphQL Error] {err.get('message')}")
@@ -64,6 +145,29 @@ def gql(token: str, query: str, variables: dict = None):
     return data["data"]
 
 
+_node = itemgetter("node")
+
+
+def nodes(connection: dict) -> list:
+    """Unwrap a GraphQL connection's edges → list of nodes."""
+    return list(map(_node, connection["edges"]))
+
+
+def _repo(service: dict):
+    """GitHub repo a service deploys from, or None (source is null for image/empty services)."""
+    src = service.get("source")
+    return src.get("repo") if src else None
+
+
+def delete_all(pool, token: str, mutation: str, items: list, label: str):
+    """Run one delete mutation per item on the pool; print each result as it lands."""
+    futures = {pool.submit(gql, token, mutation, {"id": it["id"]}): it for it in items}
+    for fut in as_completed(futures):
+        it = futures[fut]
+        fut.result()
+        print(f"  🗑  {label}: {it['name']} [{it['id'][:8]}] ... تم")
+
+
 def separator(title=""):
     print("\n" + "─" * 60)
     if title:
@@ -108,18 +212,14 @@ query GetVars($serviceId: String!, $environmentId: String!) {
 }
 """
 
-Q_ENVIRONMENTS = """
-query GetEnvs($projectId: String!) {
+# Environments + volumes in one round-trip (both keyed only by projectId)
+Q_ENVS_AND_VOLUMES = """
+query GetEnvsAndVolumes($projectId: String!) {
   environments(projectId: $projectId) {
     edges {
       node { id name }
     }
   }
-}
-"""
-
-Q_VOLUMES = """
-query GetVolumes($projectId: String!) {
   volumes(projectId: $projectId) {
     edges {
       node {
@@ -196,23 +296,31 @@ def main():
     parser.add_argument("--token", required=True, help="Railway API token")
     parser.add_argument("--dry-run", action="store_true",
                         help="Show what would be done without making changes")
+    parser.add_argument("--workers", type=int, default=MAX_WORKERS,
+                        help=f"Parallel API requests for reads/deletes (default {MAX_WORKERS})")
     args = parser.parse_args()
+    if args.workers < 1:
+        parser.error("--workers must be at least 1")
 
     token = args.token
     dry_run = args.dry_run
 
     if dry_run:
         print("[DRY RUN] لن يتم إجراء أي تغييرات فعلية")
+    plan = []   # dry-run: every change that would be made, printed once at the end
+
+    # Independent reads and bulk deletes run side by side on the pool
+    pool = ThreadPoolExecutor(max_workers=args.workers)
 
     # ── 1. Auth check ──────────────────────────────────────────────────────────
     separator("1. التحقق من الـ Token")
+    projects_future = pool.submit(gql, token, Q_PROJECTS)
     me = gql(token, Q_ME)["me"]
     print(f"✅ مسجّل دخول كـ: {me['name']} ({me['email']})")
 
     # ── 2. Audit all projects ──────────────────────────────────────────────────
     separator("2. قائمة جميع المشاريع")
-    projects_data = gql(token, Q_PROJECTS)["projects"]["edges"]
-    all_projects = [e["node"] for e in projects_data]
+    all_projects = nodes(projects_future.result()["projects"])
 
     print(f"إجمالي المشاريع: {len(all_projects)}\n")
 
@@ -220,17 +328,14 @@ def main():
     to_delete = []            # المشاريع المراد حذفها
 
     for p in all_projects:
-        services = [e["node"] for e in p["services"]["edges"]]
-        linked = any(
-            (s.get("source") or {}).get("repo") == GITHUB_REPO
-            for s in services
-        )
+        services = nodes(p["services"])
+        linked = GITHUB_REPO in {_repo(s) for s in services}
         is_canonical = p["id"] == PROJECT_ID
 
         status = []
         if is_canonical:
             status.append("✅ المشروع الأساسي")
-        elif p["name"].lower() == PROJECT_NAME.lower():
+        elif p["name"].lower() == _PROJECT_NAME_LC:
             status.append("اسم مطابق (نسخة مكررة)")
         elif linked:
             status.append(f"مرتبط بـ {GITHUB_REPO} (نسخة مكررة)")
@@ -257,46 +362,40 @@ def main():
 
     if not to_delete:
         print("✅ لا توجد مشاريع زائدة للحذف")
+    elif not dry_run:
+        delete_all(pool, token, M_DELETE_PROJECT, to_delete, "حذف")
     else:
-        for p in to_delete:
-            print(f"  🗑  حذف: {p['name']} [{p['id'][:8]}] ... ", end="", flush=True)
-            if not dry_run:
-                gql(token, M_DELETE_PROJECT, {"id": p["id"]})
-                time.sleep(0.5)
-                print("تم")
-            else:
-                print("(dry-run)")
+        print(f"  🗑  {len(to_delete)} مشروع للحذف (dry-run)")
+        plan += [f"🗑  حذف مشروع: {p['name']} [{p['id'][:8]}]" for p in to_delete]
 
     # ── 5. Create project if missing ───────────────────────────────────────────
     if correct_project is None:
         separator("5. إنشاء مشروع bugksa-bot")
         if not dry_run:
-            result = gql(token, M_CREATE_PROJECT, {"name": PROJECT_NAME})
+            result = gql(token, M_CREATE_PROJECT, {"name": PROJECT_NAME}, idempotent=False)
             correct_project = result["projectCreate"]
             print(f"✅ تم إنشاء المشروع: {correct_project['name']} [{correct_project['id'][:8]}]")
         else:
             print("(dry-run) سيتم إنشاء مشروع bugksa-bot")
-            return  # can't continue without real project ID
-
-    project_id = PROJECT_ID
+            plan.append(f"➕ إنشاء مشروع: {PROJECT_NAME}")
+            # No real id yet – carry on with an empty project so the rest gets planned too
+            correct_project = {"id": None, "name": PROJECT_NAME}
 
-    # Refresh project services after deletions
-    fresh = gql(token, Q_PROJECTS)["projects"]["edges"]
-    for e in fresh:
-        if e["node"]["id"] == project_id:
-            correct_project = e["node"]
-            break
+    # Deleting other projects doesn't touch this one's services, so the step-2
+    # listing is still current; a project created just now has none yet.
+    project_id = correct_project["id"]
+    correct_project.setdefault("services", {"edges": []})
 
     # ── 6. Audit services ──────────────────────────────────────────────────────
     separator("6. مراجعة الخدمات داخل bugksa-bot")
 
-    services = [e["node"] for e in correct_project["services"]["edges"]]
+    services = nodes(correct_project["services"])
     worker_service = None
     services_to_delete = []
 
     for s in services:
-        repo = (s.get("source") or {}).get("repo", "بدون مصدر")
-        is_worker = s["name"].lower() == SERVICE_NAME.lower()
+        repo = _repo(s) or "بدون مصدر"
+        is_worker = s["name"].lower() == _SERVICE_NAME_LC
         print(f"  [{s['id'][:8]}] {s['name']:25} | repo: {repo}")
         if is_worker and worker_service is None:
             worker_service = s
@@ -306,13 +405,10 @@ def main():
             services_to_delete.append(s)  # خدمة غير ضرورية
 
     # حذف الخدمات الزائدة
-    for s in services_to_delete:
-        print(f"  🗑  حذف خدمة: {s['name']} [{s['id'][:8]}] ... ", end="", flush=True)
-        if not dry_run:
-            gql(token, M_DELETE_SERVICE, {"id": s["id"]})
-            print("تم")
-        else:
-            print("(dry-run)")
+    if not dry_run:
+        delete_all(pool, token, M_DELETE_SERVICE, services_to_delete, "حذف خدمة")
+    else:
+        plan += [f"🗑  حذف خدمة: {s['name']} [{s['id'][:8]}]" for s in services_to_delete]
 
     # إنشاء worker إذا لم يكن موجوداً
     if worker_service is None:
@@ -322,16 +418,21 @@ def main():
                 "projectId": project_id,
                 "name": SERVICE_NAME,
                 "repo": GITHUB_REPO,
-            })
+            }, idempotent=False)
             worker_service = result["serviceCreate"]
             print(f"✅ تم إنشاء worker [{worker_service['id'][:8]}]")
         else:
             print("(dry-run) سيتم إنشاء worker")
+            plan.append(f"➕ إنشاء خدمة: {SERVICE_NAME} ← {GITHUB_REPO}")
 
     # ── 7. Get production environment ─────────────────────────────────────────
     separator("7. بيئة production")
-    envs = gql(token, Q_ENVIRONMENTS, {"projectId": project_id})
-    env_list = [e["node"] for e in envs["environments"]["edges"]]
+    if project_id:
+        infra = gql(token, Q_ENVS_AND_VOLUMES, {"projectId": project_id})
+    else:
+        infra = {"environments": {"edges": []}, "volumes": {"edges": []}}
+        print("  (المشروع غير موجود بعد — لا توجد بيئات)")
+    env_list = nodes(infra["environments"])
 
     prod_env = None
     for env in env_list:
@@ -347,23 +448,21 @@ def main():
 
     # ── 8. Check Volume ────────────────────────────────────────────────────────
     separator("8. التحقق من الـ Volume")
-    volumes = gql(token, Q_VOLUMES, {"projectId": project_id})
-    vol_list = [e["node"] for e in volumes["volumes"]["edges"]]
+    vol_list = nodes(infra["volumes"])
 
     bot_data_vol = None
     for v in vol_list:
-        instances = [i["node"] for i in v["volumeInstances"]["edges"]]
+        instances = nodes(v["volumeInstances"])
         mounts = [i["mountPath"] for i in instances]
         print(f"  Volume: {v['name']} [{v['id'][:8]}] | mount paths: {mounts}")
         if v["name"] == VOLUME_NAME or MOUNT_PATH in mounts:
-            bot_data_vol = v
+            bot_data_vol, bot_data_instances = v, instances
 
     if bot_data_vol:
         # تحقق أن الـ volume مربوط بـ worker في production
-        instances = [i["node"] for i in bot_data_vol["volumeInstances"]["edges"]]
         worker_attached = any(
             i.get("serviceId") == (worker_service["id"] if worker_service else None)
-            for i in instances
+            for i in bot_data_instances
         )
         if worker_attached:
             print(f"✅ Volume '{VOLUME_NAME}' مربوط بـ worker على {MOUNT_PATH}")
@@ -380,10 +479,13 @@ def main():
                 "mountPath": MOUNT_PATH,
                 "serviceId": worker_service["id"],
                 "environmentId": prod_env["id"],
-            })
+            }, idempotent=False)
             print(f"✅ تم إنشاء Volume '{VOLUME_NAME}' على {MOUNT_PATH}")
+        elif dry_run:
+            print(f"   (dry-run)")
+            plan.append(f"➕ إنشاء Volume: {VOLUME_NAME} → {MOUNT_PATH} (worker)")
         else:
-            print(f"   (dry-run أو بيانات ناقصة)")
+            print(f"   (بيانات ناقصة — worker أو بيئة production غير موجودة)")
 
     # ── 9. Check env variables ─────────────────────────────────────────────────
     separator("9. التحقق من متغيرات البيئة")
@@ -394,36 +496,39 @@ def main():
                 "serviceId": worker_service["id"],
                 "environmentId": prod_env["id"],
             })
-            existing_vars = set(vars_data.get("variables", {}).keys())
-
-            all_present = True
-            for var in REQUIRED_VARS:
-                if var in existing_vars:
-                    print(f"  ✅ {var}")
-                else:
-                    print(f"  ❌ {var} — مفقود! أضفه يدوياً في Railway Dashboard")
-                    all_present = False
-
-            if all_present:
-                print("\n✅ جميع المتغيرات موجودة")
+            existing_vars = set(vars_data.get("variables", {}))
+            missing = set(REQUIRED_VARS) - existing_vars
+
+            lines = [
+                f"  ❌ {v} — مفقود! أضفه يدوياً في Railway Dashboard" if v in missing else f"  ✅ {v}"
+                for v in REQUIRED_VARS
+            ]
+            if not missing:
+                lines.append("\n✅ جميع المتغيرات موجودة")
             else:
-                print("\n⚠️  بعض المتغيرات مفقودة — أضفها في:")
-                print(f"   Railway Dashboard → bugksa-bot → worker → Variables")
+                lines.append("\n⚠️  بعض المتغيرات مفقودة — أضفها في:")
+                lines.append("   Railway Dashboard → bugksa-bot → worker → Variables")
+            print("\n".join(lines))
         except Exception as e:
             print(f"⚠️  لم نتمكن من قراءة المتغيرات: {e}")
     else:
         print("⚠️  لا يمكن التحقق بدون worker أو بيئة production")
 
     # ── 10. Final Report ───────────────────────────────────────────────────────
-    separator("التقرير النهائي")
+    if dry_run:
+        separator("خطة التنفيذ (dry-run)")
+        for i, step in enumerate(plan, 1):
+            print(f"  {i}. {step}")
+        if not plan:
+            print("✅ لا توجد تغييرات — الحساب نظيف")
+
+    separator("التقرير النهائي" if not dry_run else "الحالة بعد تنفيذ الخطة")
 
-    # إعادة جلب المشاريع بعد كل التعديلات
-    final_projects = gql(token, Q_PROJECTS)["projects"]["edges"]
-    print(f"عدد المشاريع المتبقية: {len(final_projects)}")
-    for e in final_projects:
-        p = e["node"]
-        svcs = [s["node"]["name"] for s in p["services"]["edges"]]
-        print(f"  • {p['name']} [{p['id'][:8]}] → خدمات: {svcs or ['(لا توجد)']}")
+    # من الحالة في الذاكرة — كل حذف/إنشاء إما نجح أو أوقف التشغيل (أو مخطط له في dry-run)
+    worker_name = worker_service["name"] if worker_service else SERVICE_NAME
+    project_ref = (correct_project["id"] or "جديد")[:8]
+    print("عدد المشاريع المتبقية: 1")
+    print(f"  • {correct_project['name']} [{project_ref}] → خدمات: {[worker_name]}")
 
     print()
     print("═" * 60)
@@ -434,6 +539,9 @@ def main():
     print(f"  GitHub   : {GITHUB_REPO}")
     print("═" * 60)
     print("\n✅ اكتمل التنظيف بنجاح" if not dry_run else "\n[DRY RUN] اكتمل الفحص")
+    pool.shutdown()
+    for conn in _conns:
+        conn.close()
 
 
 if __name__ == "__main__":